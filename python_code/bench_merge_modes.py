@@ -0,0 +1,87 @@
+import os
+import re
+import sys
+import time
+import tempfile
+import subprocess
+from merge_videos import merge_with_ffmpeg
+
+# Synthetic inputs (FFmpeg lavfi sources)
+# - static: a "slide" that changes every 10s, duplicated to 15 fps
+# - motion: continuously moving test pattern
+DESKSHARE_SOURCES = {
+    "static": "testsrc=size=1920x1080:rate=0.1,fps=15",
+    "motion": "testsrc2=size=1920x1080:rate=15"
+}
+# - static: a still picture (camera off or covered)
+# - live: a moving picture every frame, like a real lecturer on camera
+WEBCAM_SOURCES = {
+    "static": "smptebars=size=640x480:rate=15",
+    "live": "testsrc2=size=640x480:rate=15"
+}
+
+def generate_inputs(work_dir, desk_kind, webcam_kind, duration):
+    """Generate a synthetic deskshare/webcam pair for a benchmark run"""
+    desk_file = os.path.join(work_dir, f"{desk_kind}_deskshare.mkv")
+    webcam_file = os.path.join(work_dir, f"{webcam_kind}_webcams.mkv")
+
+    if not os.path.exists(desk_file):
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", DESKSHARE_SOURCES[desk_kind],
+             "-t", str(duration), "-c:v", "libx264", "-preset", "ultrafast", desk_file],
+            check=True
+        )
+    if not os.path.exists(webcam_file):
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", WEBCAM_SOURCES[webcam_kind],
+             "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+             "-t", str(duration), "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", webcam_file],
+            check=True
+        )
+    return desk_file, webcam_file
+
+def count_frames(media_file):
+    """Count video frames in a file by decoding it to the null muxer"""
+    result = subprocess.run(
+        ["ffmpeg", "-i", media_file, "-map", "0:v:0", "-fps_mode", "passthrough", "-f", "null", "-"],
+        capture_output=True, text=True
+    )
+    # The final progress line reports the total, e.g. "frame= 1800 fps=..."
+    matches = re.findall(r'frame=\s*(\d+)', result.stderr)
+    return matches[-1] if matches else "?"
+
+def main():
+    """Compare standard and lecture encode modes on static/motion slides with a static/live webcam"""
+    duration = int(sys.argv[1]) if len(sys.argv) > 1 else 120
+    print(f"Benchmarking merge modes on {duration}s synthetic inputs...\n")
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for desk_kind in DESKSHARE_SOURCES:
+            for webcam_kind in WEBCAM_SOURCES:
+                desk_file, webcam_file = generate_inputs(work_dir, desk_kind, webcam_kind, duration)
+
+                for mode in ("standard", "lecture"):
+                    output_file = os.path.join(work_dir, f"{desk_kind}_{webcam_kind}_{mode}.mp4")
+                    start = time.time()
+                    if not merge_with_ffmpeg(desk_file, webcam_file, output_file, mode=mode):
+                        continue
+                    elapsed = time.time() - start
+
+                    results.append({
+                        "input": desk_kind,
+                        "webcam": webcam_kind,
+                        "mode": mode,
+                        "seconds": elapsed,
+                        "size_mb": os.path.getsize(output_file) / 1024 ** 2,
+                        "frames": count_frames(output_file)
+                    })
+
+    print(f"\n{'input':<8} {'webcam':<7} {'mode':<9} {'time':>8} {'speed':>7} {'size':>9} {'frames':>7}")
+    for r in results:
+        speed = duration / r["seconds"] if r["seconds"] else 0
+        print(f"{r['input']:<8} {r['webcam']:<7} {r['mode']:<9} {r['seconds']:>7.1f}s {speed:>6.1f}x "
+              f"{r['size_mb']:>7.1f}MB {r['frames']:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,21 @@ import re
 import datetime
 import subprocess
 import glob
+import time
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from tracing import span
+from scheduling import order_jobs
+from merge_videos import is_merged
+import media_store
 
 # Load environment variables
 load_dotenv()
 
+MEDIA_EXTENSIONS = ('.webm', '.mp4', '.m4a', '.ogg', '.opus', '.mkv')
+
 def sanitize_filter_name(filter_name):
     """Sanitize filter name for use in filenames and directories"""
     import unicodedata
@@ -32,6 +42,230 @@ def extract_timestamp_from_url(video_url):
     except:
         return None
 
+def track_suffix(video_url):
+    """Return the track name (webcams, deskshare or video) for a media URL"""
+    if "webcams" in video_url:
+        return "webcams"
+    if "deskshare" in video_url:
+        return "deskshare"
+    return "video"
+
+def probe_media(video_url, timeout=15):
+    """Issue a HEAD request for a media URL and report existence, size and type"""
+    result = {"url": video_url, "exists": None, "size": None, "type": ""}
+    request = urllib.request.Request(video_url, method="HEAD")
+    
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            length = response.headers.get("Content-Length")
+            result["exists"] = True
+            result["size"] = int(length) if length and length.isdigit() else None
+            result["type"] = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    except urllib.error.HTTPError as e:
+        # Only a definite "gone" counts as missing; anything else (e.g. 405 for
+        # servers that refuse HEAD) leaves the track to be tried by wget
+        if e.code in (404, 410):
+            result["exists"] = False
+    except Exception:
+        pass
+    
+    return result
+
+def is_media(probe):
+    """Decide whether a probed URL points at an audio/video file"""
+    if probe["type"].startswith(("video/", "audio/")):
+        return True
+    # Unknown or generic types fall back to the URL extension
+    if probe["type"] in ("", "application/octet-stream", "binary/octet-stream"):
+        path = probe["url"].split("?")[0].lower()
+        return path.endswith(MEDIA_EXTENSIONS)
+    return False
+
+def measure_bandwidth(video_url, sample_bytes=2 * 1024 * 1024, timeout=15):
+    """Estimate download bandwidth (bytes/s) from a short ranged GET"""
+    override = os.getenv('DOWNLOAD_BANDWIDTH_MBPS', '')
+    if override:
+        try:
+            return float(override) * 1_000_000 / 8
+        except ValueError:
+            print(f"⚠ Ignoring invalid DOWNLOAD_BANDWIDTH_MBPS: {override}")
+    
+    request = urllib.request.Request(video_url, headers={"Range": f"bytes=0-{sample_bytes - 1}"})
+    try:
+        start = time.time()
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            received = len(response.read(sample_bytes))
+        elapsed = time.time() - start
+        return received / elapsed if received and elapsed > 0 else None
+    except Exception:
+        return None
+
+def format_size(num_bytes):
+    """Format a byte count as GB/MB"""
+    if num_bytes >= 1024 ** 3:
+        return f"{num_bytes / 1024 ** 3:.2f} GB"
+    return f"{num_bytes / 1024 ** 2:.1f} MB"
+
+def plan_downloads(data, output_dir, merged_dir, probe=True):
+    """Build the download plan, probing every candidate URL in parallel"""
+    plan = []
+    skipped_merge_count = 0
+    
+    for item in data:
+        name = item.get("name", "")
+        videos = item.get("scraped_content", {}).get("videos", [])
+        
+        if not videos:
+            print(f"⚠ Skipping: No videos for '{name}'")
+            continue
+        
+        # Extract timestamp from first video URL
+        file_prefix = extract_timestamp_from_url(videos[0])
+        
+        if not file_prefix:
+            print(f"⚠ Skipping: Could not extract timestamp from URL for '{name}'")
+            continue
+            
+        # Check if merged video already exists (MP4 or a complete HLS playlist)
+        if is_merged(merged_dir, file_prefix):
+            print(f"⏭ {file_prefix}_merged (already merged)")
+            skipped_merge_count += 1
+            continue
+        
+        tracks = []
+        for video_url in videos:
+            suffix = track_suffix(video_url)
+            filename = f"{file_prefix}_{suffix}.webm"
+            tracks.append({
+                "url": video_url,
+                "suffix": suffix,
+                "filename": filename,
+                "output_path": os.path.join(output_dir, filename),
+                "size": None,
+                "type": ""
+            })
+        
+        plan.append({"name": name, "prefix": file_prefix, "tracks": tracks})
+    
+    if probe:
+        pending = [t for entry in plan for t in entry["tracks"] if not have_track(t["url"], t["output_path"])]
+        workers = int(os.getenv('PROBE_WORKERS', '16'))
+        if pending:
+            print(f"\n🔎 Probing {len(pending)} media URLs...")
+            with span("probe media", cat="network", urls=len(pending)), \
+                    ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                probes = list(executor.map(probe_media, [t["url"] for t in pending]))
+            
+            results = {id(t): p for t, p in zip(pending, probes)}
+            for entry in plan:
+                kept = []
+                for track in entry["tracks"]:
+                    result = results.get(id(track))
+                    if result is None:
+                        kept.append(track)
+                    elif result["exists"] is False:
+                        print(f"   ✗ {track['filename']} not found (404)")
+                    elif not is_media(result):
+                        print(f"   ⚠ Dropping non-media link: {track['url'][:60]}")
+                    else:
+                        track["size"] = result["size"]
+                        track["type"] = result["type"]
+                        kept.append(track)
+                entry["tracks"] = kept
+            plan = [entry for entry in plan if entry["tracks"]]
+    
+    return plan, skipped_merge_count
+
+def plan_entry_size(entry):
+    """Bytes still to fetch for a plan entry, or None if any track size is unknown"""
+    total = 0
+    for track in entry["tracks"]:
+        if have_track(track["url"], track["output_path"]):
+            continue
+        if track["size"] is None:
+            return None
+        total += track["size"]
+    return total
+
+def order_plan(plan):
+    """Order plan entries by SCHEDULE_POLICY"""
+    return order_jobs(plan, prefix_of=lambda e: e["prefix"], size_of=plan_entry_size, name_of=lambda e: e["name"])
+
+def print_plan(plan):
+    """Print per-recording sizes, total and ETA for the download plan"""
+    total_bytes = 0
+    unknown = 0
+    
+    print(f"\n📋 Download plan ({len(plan)} recordings)")
+    for entry in plan:
+        parts = []
+        entry_bytes = 0
+        for track in entry["tracks"]:
+            suffix = track["suffix"]
+            if have_track(track["url"], track["output_path"]):
+                parts.append(f"{suffix} on disk")
+            elif track["size"] is None:
+                parts.append(f"{suffix} ?")
+                unknown += 1
+            else:
+                parts.append(f"{suffix} {format_size(track['size'])}")
+                entry_bytes += track["size"]
+        total_bytes += entry_bytes
+        print(f"   {entry['prefix']}  {format_size(entry_bytes):>10}  ({', '.join(parts)})")
+    
+    print(f"   Total to fetch: {format_size(total_bytes)}")
+    if unknown:
+        print(f"   ⚠ {unknown} track(s) of unknown size not included")
+    
+    if total_bytes:
+        sample_url = next(t["url"] for entry in plan for t in entry["tracks"] if t["size"])
+        bandwidth = measure_bandwidth(sample_url)
+        if bandwidth:
+            eta_minutes = max(1, round(total_bytes / bandwidth / 60))
+            print(f"   ETA: ~{eta_minutes} min at {bandwidth / 1024 ** 2:.1f} MB/s")
+    print()
+
+def download_file(video_url, output_path):
+    """Download one file with wget, renaming into place only once complete"""
+    part_path = f"{output_path}.part"
+    try:
+        with span("download", cat="network", file=os.path.basename(output_path)):
+            subprocess.run(
+                ["wget", "-q", "--show-progress", "-O", part_path, video_url],
+                check=True
+            )
+        os.replace(part_path, output_path)
+        print(f"  ✓")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"  ✗ Failed to download: {e}")
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return False
+
+def have_track(video_url, output_path):
+    """Check whether a track is already on disk, in this directory or the media store"""
+    if os.path.exists(output_path):
+        return True
+    store_path = media_store.track_path(video_url, track_suffix(video_url))
+    return bool(store_path) and os.path.exists(store_path)
+
+def fetch_track(video_url, output_path):
+    """Download a track, through the shared media store when MEDIA_STORE is set"""
+    store_path = media_store.track_path(video_url, track_suffix(video_url))
+    if not store_path:
+        return download_file(video_url, output_path)
+    
+    # Each recording is fetched once; every filter directory links to the same file.
+    # The lock keeps concurrent runs and workers from writing the same .part file
+    with media_store.lock(store_path):
+        if os.path.exists(store_path):
+            print(f"  ✓ (from media store)")
+        elif not download_file(video_url, store_path):
+            return False
+    media_store.link_into(store_path, output_path)
+    return True
+
 def download_videos():
     """Download videos from playback data"""
     print("Starting SENCE Video Downloader (Python)...\n")
@@ -73,43 +307,18 @@ def download_videos():
     print(f"Output: {output_dir}")
     print(f"Checking Merged: {merged_dir}\n")
     
-    skipped_merge_count = 0
+    # Probe every URL up front (set PROBE_MEDIA=0 to skip)
+    probe = os.getenv('PROBE_MEDIA', '1') != '0'
+    plan, skipped_merge_count = plan_downloads(data, output_dir, merged_dir, probe=probe)
+    plan = order_plan(plan)
+    if probe:
+        print_plan(plan)
     
-    for item in data:
-        name = item.get("name", "")
-        videos = item.get("scraped_content", {}).get("videos", [])
-        
-        if not videos:
-            print(f"⚠ Skipping: No videos for '{name}'")
-            continue
-        
-        # Extract timestamp from first video URL
-        file_prefix = extract_timestamp_from_url(videos[0])
-        
-        if not file_prefix:
-            print(f"⚠ Skipping: Could not extract timestamp from URL for '{name}'")
-            continue
-            
-        # Check if merged video already exists (support both .mp4 and .webm as per previous scripts)
-        # We'll check for .mp4 as that's the new standard
-        merged_path = os.path.join(merged_dir, f"{file_prefix}_merged.mp4")
-        if os.path.exists(merged_path):
-            print(f"⏭ {file_prefix}_merged.mp4 (already merged)")
-            skipped_merge_count += 1
-            continue
-        
-        for video_url in videos:
-            # Determine suffix (webcams vs deskshare)
-            if "webcams" in video_url:
-                suffix = "webcams"
-            elif "deskshare" in video_url:
-                suffix = "deskshare"
-            else:
-                suffix = "video"
-            
-            # Construct filename
-            filename = f"{file_prefix}_{suffix}.webm"
-            output_path = os.path.join(output_dir, filename)
+    for entry in plan:
+        for track in entry["tracks"]:
+            video_url = track["url"]
+            filename = track["filename"]
+            output_path = track["output_path"]
             
             # Download using wget
             if os.path.exists(output_path):
@@ -118,13 +327,7 @@ def download_videos():
             
             print(f"⬇ {filename}...")
             try:
-                subprocess.run(
-                    ["wget", "-q", "--show-progress", "-O", output_path, video_url],
-                    check=True
-                )
-                print(f"  ✓")
-            except subprocess.CalledProcessError as e:
-                print(f"  ✗ Failed to download: {e}")
+                fetch_track(video_url, output_path)
             except FileNotFoundError:
                 print("  ✗ 'wget' not found. Please install wget.")
                 return
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import socket
+import datetime
+import subprocess
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# libx264 presets from fastest to slowest, with the CRF used at each.
+# Fast presets compress worse, so they get a slightly higher CRF to keep file sizes in check
+PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow']
+PRESET_CRF = {
+    'ultrafast': 30, 'superfast': 29, 'veryfast': 28, 'faster': 28,
+    'fast': 28, 'medium': 27, 'slow': 26
+}
+DEFAULT_PRESET = 'fast'
+
+SPEED_FILE = os.getenv('ENCODE_SPEED_FILE', 'encode_speed.json')
+
+def probe_video(media_file):
+    """Return (duration_seconds, width, height) of a video file using ffprobe"""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=width,height:format=duration", "-of", "json", media_file],
+            check=True, capture_output=True, text=True
+        )
+        info = json.loads(result.stdout)
+        stream = info["streams"][0]
+        return float(info["format"]["duration"]), int(stream["width"]), int(stream["height"])
+    except (subprocess.CalledProcessError, FileNotFoundError, KeyError, IndexError, ValueError):
+        return None
+
+def load_speeds():
+    """Load this host's measured encoder speeds (input pixel-seconds per wall second)"""
+    if not os.path.exists(SPEED_FILE):
+        return {}
+    try:
+        with open(SPEED_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get(socket.gethostname(), {})
+    except (OSError, ValueError):
+        return {}
+
+def save_speeds(speeds):
+    """Store this host's encoder speeds, keeping other hosts' entries"""
+    data = {}
+    if os.path.exists(SPEED_FILE):
+        try:
+            with open(SPEED_FILE, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+    data[socket.gethostname()] = speeds
+    with open(SPEED_FILE, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+def measure_encoder_speed(preset, seconds=5):
+    """Time a short synthetic 1080p encode with the merge scaling at a given preset"""
+    width, height, fps = 1920, 1080, 15
+    cmd = [
+        "ffmpeg", "-v", "error", "-f", "lavfi",
+        "-i", f"testsrc2=size={width}x{height}:rate={fps}", "-t", str(seconds),
+        "-vf", "scale=1280:-2", "-c:v", "libx264", "-preset", preset, "-crf", str(PRESET_CRF[preset]),
+        "-f", "null", "-"
+    ]
+    start = time.time()
+    subprocess.run(cmd, check=True, capture_output=True)
+    return seconds * width * height / (time.time() - start)
+
+def get_speeds():
+    """Return measured speeds for every preset, calibrating any that are missing"""
+    speeds = load_speeds()
+    missing = [p for p in PRESETS if p not in speeds]
+    if missing:
+        print(f"⏱ Calibrating encoder speed on this host ({len(missing)} presets)...")
+        for preset in missing:
+            speeds[preset] = measure_encoder_speed(preset)
+        save_speeds(speeds)
+    return speeds
+
+def record_actual_speed(preset, duration, width, height, elapsed, weight=0.3):
+    """Fold an observed encode into the stored speed for its preset"""
+    if elapsed <= 0:
+        return
+    speeds = load_speeds()
+    observed = duration * width * height / elapsed
+    speeds[preset] = (1 - weight) * speeds[preset] + weight * observed if preset in speeds else observed
+    save_speeds(speeds)
+
+def get_budget_seconds():
+    """Wall-clock budget from ENCODE_DEADLINE and/or ENCODE_CPU_HOURS, or None"""
+    budgets = []
+
+    deadline = os.getenv('ENCODE_DEADLINE', '')
+    if deadline:
+        try:
+            # Either hours from now ("6") or a local timestamp ("2026-01-12T08:00")
+            budgets.append(float(deadline) * 3600)
+        except ValueError:
+            try:
+                target = datetime.datetime.fromisoformat(deadline)
+                budgets.append((target - datetime.datetime.now()).total_seconds())
+            except ValueError:
+                print(f"⚠ Ignoring invalid ENCODE_DEADLINE: {deadline}")
+
+    cpu_hours = os.getenv('ENCODE_CPU_HOURS', '')
+    if cpu_hours:
+        try:
+            # libx264 keeps every core busy, so wall time = CPU time / cores
+            budgets.append(float(cpu_hours) * 3600 / (os.cpu_count() or 1))
+        except ValueError:
+            print(f"⚠ Ignoring invalid ENCODE_CPU_HOURS: {cpu_hours}")
+
+    return min(budgets) if budgets else None
+
+def plan_encodes(jobs, budget_seconds, speeds):
+    """Pick a preset per job so the predicted total fits the budget
+
+    Every job starts at the slowest allowed preset (best compression). While the
+    total is over budget, the job whose next-faster preset saves the most time is
+    stepped down. `jobs` are dicts with prefix, duration, width and height.
+    """
+    slowest_preset = os.getenv('ENCODE_SLOWEST_PRESET', 'medium')
+    if slowest_preset not in PRESETS:
+        print(f"⚠ Ignoring invalid ENCODE_SLOWEST_PRESET: {slowest_preset} (use one of {', '.join(PRESETS)})")
+        slowest_preset = 'medium'
+    slowest = PRESETS.index(slowest_preset)
+
+    def cost(job, level):
+        return job["duration"] * job["width"] * job["height"] / speeds[PRESETS[level]]
+
+    levels = {job["prefix"]: slowest for job in jobs}
+    total = sum(cost(job, slowest) for job in jobs)
+
+    while total > budget_seconds:
+        candidates = [job for job in jobs if levels[job["prefix"]] > 0]
+        if not candidates:
+            break
+        best = max(candidates, key=lambda j: cost(j, levels[j["prefix"]]) - cost(j, levels[j["prefix"]] - 1))
+        level = levels[best["prefix"]]
+        total -= cost(best, level) - cost(best, level - 1)
+        levels[best["prefix"]] = level - 1
+
+    plan = {}
+    for job in jobs:
+        preset = PRESETS[levels[job["prefix"]]]
+        plan[job["prefix"]] = {
+            **job,
+            "preset": preset,
+            "crf": PRESET_CRF[preset],
+            "predicted_seconds": cost(job, levels[job["prefix"]])
+        }
+    return plan, total
+
+def build_plan(input_dir, prefixes):
+    """Probe pending recordings and plan presets/CRFs against the configured budget
+
+    Returns None (use the default preset) when no budget is configured.
+    """
+    budget = get_budget_seconds()
+    if budget is None:
+        return None
+
+    jobs = []
+    for prefix in prefixes:
+        info = probe_video(os.path.join(input_dir, f"{prefix}_deskshare.webm"))
+        if info:
+            duration, width, height = info
+            jobs.append({"prefix": prefix, "duration": duration, "width": width, "height": height})
+    if not jobs:
+        return None
+
+    try:
+        speeds = get_speeds()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        print("⚠ Could not measure encoder speed; using default preset")
+        return None
+
+    plan, total = plan_encodes(jobs, max(budget, 0), speeds)
+
+    finish = datetime.datetime.now() + datetime.timedelta(seconds=total)
+    print(f"📋 Encode plan: {len(jobs)} recordings, budget {budget / 3600:.1f}h, "
+          f"predicted {total / 3600:.1f}h (done ~{finish:%Y-%m-%d %H:%M})")
+    if total > budget:
+        print("   ⚠ Backlog does not fit the budget even at the fastest preset")
+    for prefix, entry in plan.items():
+        print(f"   {prefix}  {entry['duration'] / 60:>5.0f} min  {entry['width']}x{entry['height']}  "
+              f"{entry['preset']:<9} crf {entry['crf']}  ~{entry['predicted_seconds'] / 60:.0f} min")
+    print()
+    return plan
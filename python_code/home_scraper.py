@@ -1,17 +1,24 @@
 import os
-import time
 import json
 from dotenv import load_dotenv
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 import auth
+from tracing import span, traced_sleep
 
 # Load environment variables
 load_dotenv()
 
+# Reads every BBB module link in one WebDriver call
+MODULE_LINKS_SCRIPT = """
+return Array.from(document.querySelectorAll("a[href*='mod/bigbluebuttonbn']")).map(a => ({
+    name: a.innerText,
+    url: a.href
+}));
+"""
+
 def setup_driver():
     """Set up Chrome WebDriver"""
     options = Options()
@@ -25,22 +32,23 @@ def setup_driver():
 def scrape_home(driver, base_url):
     """Scrape BigBlueButton modules from home page"""
     print(f"\nNavigating to: {base_url}")
-    driver.get(base_url)
-    time.sleep(3)
+    with span("page load", cat="browser", url=base_url):
+        driver.get(base_url)
+    traced_sleep(3)
     
     print(f"Scraping: {driver.title}")
     modules = []
     
     try:
-        # Find all BBB module links
-        links = driver.find_elements(By.CSS_SELECTOR, "a[href*='mod/bigbluebuttonbn']")
+        # Find all BBB module links (names and URLs in a single in-page script call)
+        links = driver.execute_script(MODULE_LINKS_SCRIPT)
         
         print(f"   -> Found {len(links)} BBB modules")
         
         for link in links:
             try:
-                module_name = link.text.strip()
-                module_url = link.get_attribute("href")
+                module_name = (link["name"] or "").strip()
+                module_url = link["url"]
                 
                 if module_name and module_url:
                     modules.append({
@@ -69,11 +77,14 @@ def main():
     
     try:
         # Navigate to home URL
-        driver.get(home_url)
-        time.sleep(2)
+        with span("page load", cat="browser", url=home_url):
+            driver.get(home_url)
+        traced_sleep(2)
         
         # Attempt auto-login
-        if not auth.auto_login(driver):
+        with span("login", cat="browser"):
+            logged_in = auth.auto_login(driver)
+        if not logged_in:
             print("\n" + "="*60)
             print("Auto-login failed or no credentials provided.")
             print("Please log in manually in the browser window.")
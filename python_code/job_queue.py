@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import sqlite3
+
+DEFAULT_QUEUE_FILE = 'job_queue.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    priority INTEGER NOT NULL DEFAULT 0,
+    depends_on INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (kind, key)
+)
+"""
+
+class JobQueue:
+    """Lease-based job queue stored in a SQLite file
+
+    Workers claim a job for `lease_seconds` and must heartbeat to keep it.
+    A lease that runs out (worker died or hung) is put back in the queue
+    by the next claim, up to `max_attempts` times.
+    """
+
+    def __init__(self, path=None, lease_seconds=None, max_attempts=3):
+        self.path = path or os.getenv('JOB_QUEUE', DEFAULT_QUEUE_FILE)
+        self.lease_seconds = lease_seconds or int(os.getenv('JOB_LEASE_SECONDS', '300'))
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+
+    def _connect(self):
+        """Open a connection (one per call, so threads and processes never share one)"""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, kind, key, payload, priority=0, depends_on=None):
+        """Add a job unless one with the same kind/key exists; returns the job id
+
+        An existing job that has failed for good is queued again with a fresh
+        attempt count, so re-running enqueue retries it (e.g. after an outage).
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO jobs (kind, key, payload, priority, depends_on, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, key, json.dumps(payload, ensure_ascii=False), priority, depends_on, now, now)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, error = NULL, worker = NULL, "
+                "lease_expires = NULL, updated = ? WHERE kind = ? AND key = ? AND status = 'failed'",
+                (now, kind, key)
+            )
+            row = conn.execute("SELECT id FROM jobs WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+            return row["id"]
+
+    def add_to_payload(self, job_id, field, value):
+        """Append a value to a list in a job's payload, if it is not there yet
+
+        A job that already finished is queued again so the new value gets handled;
+        a running one is requeued by complete() when it sees the payload changed.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            payload = json.loads(row["payload"])
+            if value in payload.setdefault(field, []):
+                conn.execute("COMMIT")
+                return
+            payload[field].append(value)
+            conn.execute(
+                "UPDATE jobs SET payload = ?, updated = ?, "
+                "status = CASE WHEN status = 'done' THEN 'queued' ELSE status END WHERE id = ?",
+                (json.dumps(payload, ensure_ascii=False), now, job_id)
+            )
+            conn.execute("COMMIT")
+
+    def queued_jobs(self):
+        """Return every queued job, oldest first"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id").fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            job["payload"] = json.loads(job["payload"])
+            jobs.append(job)
+        return jobs
+
+    def set_priorities(self, priorities):
+        """Update the priority of queued jobs from a {job_id: priority} dict"""
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE jobs SET priority = ?, updated = ? WHERE id = ? AND status = 'queued'",
+                [(priority, time.time(), job_id) for job_id, priority in priorities.items()]
+            )
+
+    def _sweep(self, conn, now):
+        """Requeue jobs whose lease ran out and fail jobs whose dependency failed"""
+        conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'queued' END, "
+            "attempts = attempts + 1, worker = NULL, lease_expires = NULL, "
+            "error = 'lease expired', updated = ? "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (self.max_attempts, now, now)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'dependency failed', updated = ? "
+            "WHERE status = 'queued' AND depends_on IN (SELECT id FROM jobs WHERE status = 'failed')",
+            (now,)
+        )
+
+    def claim(self, worker_id, kinds=None):
+        """Lease the highest-priority runnable job, or return None"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            # Take the write lock up front so two workers never pick the same row
+            conn.execute("BEGIN IMMEDIATE")
+            self._sweep(conn, now)
+
+            query = (
+                "SELECT j.* FROM jobs j LEFT JOIN jobs d ON j.depends_on = d.id "
+                "WHERE j.status = 'queued' AND (j.depends_on IS NULL OR d.status = 'done')"
+            )
+            params = []
+            if kinds:
+                query += f" AND j.kind IN ({','.join('?' * len(kinds))})"
+                params.extend(kinds)
+            query += " ORDER BY j.priority DESC, j.id LIMIT 1"
+
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, updated = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row["id"])
+            )
+            conn.execute("COMMIT")
+
+            job = dict(row)
+            job["payload"] = json.loads(job["payload"])
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, job_id, worker_id):
+        """Extend a lease; returns False if the job is no longer ours"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, payload):
+        """Mark a leased job as done
+
+        `payload` is the payload as claimed; if add_to_payload changed it while
+        the job ran, the job is queued again so the additions get handled.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN payload = ? THEN 'done' ELSE 'queued' END, "
+                "lease_expires = NULL, error = NULL, updated = ? "
+                "WHERE id = ? AND worker = ?",
+                (json.dumps(payload, ensure_ascii=False), time.time(), job_id, worker_id)
+            )
+
+    def fail(self, job_id, worker_id, error):
+        """Record a failed attempt; the job is retried until max_attempts"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'queued' END, "
+                "attempts = attempts + 1, worker = NULL, lease_expires = NULL, error = ?, updated = ? "
+                "WHERE id = ? AND worker = ?",
+                (self.max_attempts, str(error)[:500], time.time(), job_id, worker_id)
+            )
+
+    def counts(self, kinds=None):
+        """Return the number of jobs per status"""
+        query = "SELECT status, COUNT(*) AS n FROM jobs"
+        params = []
+        if kinds:
+            query += f" WHERE kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+        query += " GROUP BY status"
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+            return {row["status"]: row["n"] for row in rows}
+
+    def has_pending(self, kinds=None):
+        """Check whether any job of the given kinds could still run (queued or leased)"""
+        counts = self.counts(kinds)
+        return counts.get("queued", 0) + counts.get("leased", 0) > 0
@@ -0,0 +1,109 @@
+import os
+import re
+import glob
+import time
+import socket
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Shared store keyed by BBB recording id; per-filter directories become link views.
+# Empty means disabled (files live directly in the per-filter directories)
+MEDIA_STORE = os.getenv('MEDIA_STORE', '')
+
+def recording_id_from_url(video_url):
+    """Extract the BBB recording id (<hash>-<13 digit timestamp>) from a media URL"""
+    match = re.search(r'/([0-9a-f]{40}-\d{13})/', video_url)
+    return match.group(1) if match else None
+
+def recording_dir(recording_id):
+    """Store directory for one recording"""
+    return os.path.join(MEDIA_STORE, recording_id)
+
+def track_path(video_url, suffix):
+    """Store path for a track, or None if the store is disabled or the URL has no id"""
+    if not MEDIA_STORE:
+        return None
+    recording_id = recording_id_from_url(video_url)
+    if not recording_id:
+        return None
+    return os.path.join(recording_dir(recording_id), f"{suffix}.webm")
+
+def is_store_path(path):
+    """Check whether a path is inside the media store"""
+    if not MEDIA_STORE:
+        return False
+    store = os.path.abspath(MEDIA_STORE)
+    return os.path.commonpath([store, os.path.abspath(path)]) == store
+
+def find_recording_id(view_file, suffix):
+    """Find which stored recording a per-filter view file points to (hardlink or symlink)"""
+    if not MEDIA_STORE or not os.path.exists(view_file):
+        return None
+    for stored in glob.glob(os.path.join(MEDIA_STORE, "*", f"{suffix}.webm")):
+        if os.path.samefile(stored, view_file):
+            return os.path.basename(os.path.dirname(stored))
+    return None
+
+def link_into(stored_path, view_path):
+    """Expose a stored file or directory at view_path (hardlink for files, else symlink)"""
+    if os.path.lexists(view_path):
+        return
+    os.makedirs(os.path.dirname(view_path) or ".", exist_ok=True)
+    if os.path.isfile(stored_path):
+        try:
+            os.link(stored_path, view_path)
+            return
+        except OSError:
+            # Different filesystem or no hardlink support
+            pass
+    os.symlink(os.path.relpath(stored_path, os.path.dirname(view_path) or "."), view_path)
+
+def lock_is_stale(lock_path):
+    """Check whether a lock was left behind by a process on this host that no longer runs"""
+    try:
+        with open(lock_path, 'r', encoding='utf-8') as f:
+            host, pid = f.read().strip().rsplit(":", 1)
+    except (OSError, ValueError):
+        return False
+    # Only local POSIX processes can be checked (os.kill(pid, 0) terminates on Windows)
+    if host != socket.gethostname() or os.name != 'posix':
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, ValueError):
+        return False
+    return False
+
+@contextmanager
+def lock(path, poll_seconds=5):
+    """Hold an exclusive lock on a store entry (a `.lock` file next to it)
+
+    Callers re-check for the finished file once the lock is held, since another
+    process may have produced it while they waited.
+    """
+    lock_path = f"{path}.lock"
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    waiting = False
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if lock_is_stale(lock_path):
+                os.remove(lock_path)
+                continue
+            if not waiting:
+                print(f"  ⏳ Waiting for another process working on {os.path.basename(path)}...")
+                waiting = True
+            time.sleep(poll_seconds)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(f"{socket.gethostname()}:{os.getpid()}")
+        yield
+    finally:
+        os.remove(lock_path)
@@ -1,7 +1,15 @@
 import os
+import re
+import json
+import datetime
+import time
 import subprocess
 import glob
 from dotenv import load_dotenv
+from tracing import span
+from scheduling import order_jobs
+from encode_planner import build_plan, record_actual_speed, DEFAULT_PRESET, PRESET_CRF
+import media_store
 
 # Load environment variables
 load_dotenv()
@@ -14,28 +22,241 @@ def sanitize_filter_name(filter_name):
     sanitized = ''.join(c if c.isalnum() else '_' for c in without_accents).lower()
     return sanitized
 
-def merge_with_ffmpeg(desk_file, webcam_file, output_file):
-    """Merge webcam and deskshare videos using FFmpeg"""
+def probe_duration(media_file):
+    """Return the duration of a media file in seconds using ffprobe"""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", media_file],
+            check=True, capture_output=True, text=True
+        )
+        return float(result.stdout.strip())
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return None
+
+def parse_intervals(stderr, start_key, end_key):
+    """Collect (start, end) pairs from FFmpeg detector log lines; end is None if still open"""
+    intervals = []
+    # silencedetect can report a slightly negative start (e.g. -0.012) for silence at t=0
+    for match in re.finditer(rf'{start_key}:\s*(-?[\d.]+)|{end_key}:\s*(-?[\d.]+)', stderr):
+        if match.group(1) is not None:
+            intervals.append([max(0.0, float(match.group(1))), None])
+        elif intervals and intervals[-1][1] is None:
+            intervals[-1][1] = max(0.0, float(match.group(2)))
+    return [tuple(i) for i in intervals]
+
+def detect_silence(webcam_file, min_duration, noise="-50dB"):
+    """Find long silent stretches in the webcam audio track (audio-only pass)"""
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-vn", "-i", webcam_file,
+         "-af", f"silencedetect=noise={noise}:d={min_duration}", "-f", "null", "-"],
+        capture_output=True, text=True
+    )
+    return parse_intervals(result.stderr, "silence_start", "silence_end")
+
+def detect_static(desk_file, min_duration):
+    """Find long frozen stretches in the deskshare video on a 1 fps thumbnail stream"""
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-an", "-i", desk_file,
+         "-vf", f"fps=1,scale=160:-2,freezedetect=n=0.003:d={min_duration}", "-f", "null", "-"],
+        capture_output=True, text=True
+    )
+    return parse_intervals(result.stderr, "freeze_start", "freeze_end")
+
+def edge_dead_air(intervals, duration, tolerance=1.0):
+    """Return (lead_end, tail_start) for intervals touching the start/end of the recording"""
+    lead_end = 0.0
+    tail_start = duration
+    if intervals and intervals[0][0] <= tolerance:
+        lead_end = intervals[0][1] if intervals[0][1] is not None else duration
+    if intervals and (intervals[-1][1] is None or intervals[-1][1] >= duration - tolerance):
+        tail_start = intervals[-1][0]
+    return lead_end, tail_start
+
+def detect_trim_points(desk_file, webcam_file):
+    """Detect leading/trailing dead air and return trim points, or None to keep everything"""
+    min_duration = float(os.getenv('TRIM_MIN_SILENCE', '60'))
+    padding = float(os.getenv('TRIM_PADDING', '5'))
+    
+    duration = probe_duration(webcam_file)
+    if not duration:
+        return None
+    
+    try:
+        start, end = edge_dead_air(detect_silence(webcam_file, min_duration), duration)
+        
+        # Optionally only cut where the screen is also static
+        if os.getenv('TRIM_CHECK_VIDEO', '0') == '1':
+            lead_end, tail_start = edge_dead_air(detect_static(desk_file, min_duration), duration)
+            start = min(start, lead_end)
+            end = max(end, tail_start)
+    except FileNotFoundError:
+        return None
+    
+    start = max(0.0, start - padding)
+    end = min(duration, end + padding)
+    
+    # Nothing worth cutting, or the whole recording is silent
+    if end <= start or (start <= 0 and end >= duration):
+        return None
+    
+    return {"start": round(start, 2), "end": round(end, 2), "source_duration": round(duration, 2)}
+
+def record_trim_points(output_dir, prefix, trim):
+    """Append detected cut points to trim_points.json for audit"""
+    log_file = os.path.join(output_dir, "trim_points.json")
+    log = {}
+    if os.path.exists(log_file):
+        try:
+            with open(log_file, 'r', encoding='utf-8') as f:
+                log = json.load(f)
+        except (OSError, ValueError):
+            log = {}
+    
+    log[prefix] = {
+        **trim,
+        "trimmed_seconds": round(trim["source_duration"] - (trim["end"] - trim["start"]), 2),
+        "detected_at": datetime.datetime.now().isoformat(timespec='seconds')
+    }
+    
+    with open(log_file, 'w', encoding='utf-8') as f:
+        json.dump(log, f, indent=2)
+
+def hls_output_args(playlist, resume=None):
+    """FFmpeg output options for a growing HLS playlist (EVENT type) with fixed-length segments"""
+    segment_seconds = os.getenv('HLS_SEGMENT_SECONDS', '6')
+    args = [
+        # Keyframe on every segment boundary so segments cut cleanly
+        "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})",
+        "-f", "hls",
+        "-hls_time", segment_seconds,
+        "-hls_playlist_type", "event",
+        "-hls_segment_filename", os.path.join(os.path.dirname(playlist), "seg_%05d.ts")
+    ]
+    if resume:
+        args += [
+            "-hls_flags", "append_list",
+            "-start_number", str(resume["start_number"]),
+            "-output_ts_offset", str(resume["offset"])
+        ]
+    return args
+
+def hls_resume_point(playlist):
+    """Find where an interrupted HLS encode stopped; drops any half-written segment
+
+    Returns {"offset", "start_number"} or None to start from scratch.
+    """
+    if not os.path.exists(playlist):
+        return None
+    
+    segments = []
+    duration = None
+    with open(playlist, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line and not line.startswith("#") and duration is not None:
+                segments.append((duration, line))
+                duration = None
+    
+    # Segments on disk but not in the playlist were cut off mid-write
+    hls_dir = os.path.dirname(playlist)
+    listed = {uri for _, uri in segments}
+    for name in os.listdir(hls_dir):
+        if name.startswith("seg_") and name not in listed:
+            os.remove(os.path.join(hls_dir, name))
+    
+    if not segments:
+        os.remove(playlist)
+        return None
+    return {"offset": round(sum(d for d, _ in segments), 3), "start_number": len(segments)}
+
+def merged_output(output_dir, prefix, output_format="mp4"):
+    """Path of the finished output: an MP4 file, or the HLS playlist"""
+    if output_format == "hls":
+        return os.path.join(output_dir, f"{prefix}_merged", "index.m3u8")
+    return os.path.join(output_dir, f"{prefix}_merged.mp4")
+
+def is_merged(output_dir, prefix):
+    """Check for a finished MP4 or a complete (ENDLIST) HLS playlist"""
+    if os.path.exists(merged_output(output_dir, prefix)):
+        return True
+    playlist = merged_output(output_dir, prefix, "hls")
+    if os.path.exists(playlist):
+        with open(playlist, 'r', encoding='utf-8') as f:
+            return "#EXT-X-ENDLIST" in f.read()
+    return False
+
+def merge_with_ffmpeg(desk_file, webcam_file, output_file, trim=None, mode="standard", preset="fast", crf=28,
+                      output_format="mp4", resume=None, stats=None):
+    """Merge webcam and deskshare videos using FFmpeg
+
+    If `stats` is a dict, it receives the encode's wall time ("seconds") and the
+    length of input actually encoded ("duration", None if it could not be probed).
+    """
     print(f"⚙ Merging: {os.path.basename(output_file)}...")
     
+    pip = "[1]scale=iw/5:-1[pip]"
+    decimate = ""
+    frame_rate = []
+    if mode == "lecture":
+        # A live webcam changes the PIP block every frame, which would stop
+        # mpdecimate from dropping anything. Updating the PIP only a few times
+        # per second leaves runs of identical frames between updates on static slides
+        pip = f"[1]fps={os.getenv('LECTURE_PIP_FPS', '2')},scale=iw/5:-1[pip]"
+        # Drop near-duplicate frames and keep the survivors' timestamps,
+        # so the output is VFR and audio stays in sync
+        decimate = f",mpdecimate={os.getenv('DECIMATE_PARAMS', 'hi=768:lo=320:frac=0.33')}"
+        frame_rate = ["-fps_mode", "vfr"]
+    filter_graph = f"{pip};[0][pip]overlay=main_w-overlay_w-20:main_h-overlay_h-40[merged];[merged]scale=1280:-2{decimate}"
+    
+    # Seek both inputs to the same window so audio and video stay aligned
+    input_trim = []
+    resume_offset = resume["offset"] if resume else 0
+    if trim:
+        start = trim["start"] + resume_offset
+        input_trim = ["-ss", str(round(start, 3)), "-t", str(round(trim["end"] - start, 3))]
+        print(f"  ✂ Trimming to {trim['start']:.0f}s-{trim['end']:.0f}s of {trim['source_duration']:.0f}s")
+    elif resume:
+        input_trim = ["-ss", str(resume_offset)]
+    
+    # Fragmented MP4 is playable while it is written; HLS adds segments to a growing playlist
+    output_args = []
+    if output_format == "fmp4":
+        output_args = ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"]
+    elif output_format == "hls":
+        output_args = hls_output_args(output_file, resume)
+    
     try:
         # FFmpeg command to merge side-by-side
         cmd = [
             "ffmpeg",
             "-v", "quiet", "-stats",
-            "-i", desk_file,
-            "-i", webcam_file,
-            "-filter_complex", "[1]scale=iw/5:-1[pip];[0][pip]overlay=main_w-overlay_w-20:main_h-overlay_h-40[merged];[merged]scale=1280:-2",
+            *input_trim, "-i", desk_file,
+            *input_trim, "-i", webcam_file,
+            "-filter_complex", filter_graph,
             "-map", "1:a",
+            *frame_rate,
             "-c:v", "libx264",
-            "-preset", "fast",
-            "-crf", "28",
+            "-preset", preset,
+            "-crf", str(crf),
             "-c:a", "aac",
+            *output_args,
             "-y",
             output_file
         ]
         
-        subprocess.run(cmd, check=True, capture_output=True)
+        start_time = time.time()
+        with span("encode", cat="encode", file=os.path.basename(output_file), mode=mode, preset=preset, crf=crf):
+            subprocess.run(cmd, check=True, capture_output=True)
+        if stats is not None:
+            stats["seconds"] = time.time() - start_time
+            if trim:
+                stats["duration"] = trim["end"] - start
+            else:
+                source_duration = probe_duration(desk_file)
+                stats["duration"] = source_duration - resume_offset if source_duration else None
         print(f"  ✓")
         return True
     except subprocess.CalledProcessError as e:
@@ -45,6 +266,100 @@ def merge_with_ffmpeg(desk_file, webcam_file, output_file):
         print("  ✗ FFmpeg not found. Please install ffmpeg.")
         return False
 
+def input_size(input_dir, prefix):
+    """Total size of a recording's deskshare and webcam files, or None if one is missing"""
+    try:
+        return sum(os.path.getsize(os.path.join(input_dir, f"{prefix}_{track}.webm"))
+                   for track in ("deskshare", "webcams"))
+    except OSError:
+        return None
+
+def store_dir_for(input_dir, prefix):
+    """Media store directory behind a recording's deskshare view, or None"""
+    recording_id = media_store.find_recording_id(os.path.join(input_dir, f"{prefix}_deskshare.webm"), "deskshare")
+    return media_store.recording_dir(recording_id) if recording_id else None
+
+def link_merged(store_dir, output_dir, prefix):
+    """Expose a recording merged in the media store in a per-filter output directory"""
+    for output_format in ("mp4", "hls"):
+        stored = merged_output(store_dir, prefix, output_format)
+        if not os.path.exists(stored):
+            continue
+        view = merged_output(output_dir, prefix, output_format)
+        if output_format == "hls":
+            # Segments live in a directory, so the whole directory is linked
+            media_store.link_into(os.path.dirname(stored), os.path.dirname(view))
+        else:
+            media_store.link_into(stored, view)
+
+def needs_encode(input_dir, output_dir, prefix):
+    """Check whether merging a recording would actually run FFmpeg"""
+    if not os.path.exists(os.path.join(input_dir, f"{prefix}_webcams.webm")) or is_merged(output_dir, prefix):
+        return False
+    store_dir = store_dir_for(input_dir, prefix)
+    return not (store_dir and is_merged(store_dir, prefix))
+
+def merge_recording(prefix, input_dir, output_dir, encode_mode="standard", preset="fast", crf=28,
+                    output_format="mp4", encode_stats=None):
+    """Merge one recording (returns merged, skipped or failed)
+
+    `encode_stats` is passed on to merge_with_ffmpeg to collect timing of the encode itself.
+    """
+    # Get corresponding webcam file
+    desk_file = os.path.join(input_dir, f"{prefix}_deskshare.webm")
+    webcam_file = os.path.join(input_dir, f"{prefix}_webcams.webm")
+    output_file = merged_output(output_dir, prefix, output_format)
+    
+    # Check if webcam file exists
+    if not os.path.exists(webcam_file):
+        print(f"⚠ Skipping {prefix} - webcam file not found")
+        return "skipped"
+    
+    # Check if already merged
+    if is_merged(output_dir, prefix):
+        print(f"⏭ {prefix}_merged (exists)")
+        return "skipped"
+    
+    # With MEDIA_STORE, encode once into the store and link the result here
+    if not media_store.is_store_path(output_dir):
+        store_dir = store_dir_for(input_dir, prefix)
+        if store_dir:
+            # Several filters or workers can reach the same recording at once; the
+            # first encodes, the rest wait and then find it merged
+            with media_store.lock(os.path.join(store_dir, f"{prefix}_merged")):
+                status = merge_recording(prefix, input_dir, store_dir, encode_mode, preset=preset, crf=crf,
+                                         output_format=output_format, encode_stats=encode_stats)
+            if status != "failed":
+                link_merged(store_dir, output_dir, prefix)
+            return status
+    
+    # Detect dead air at the start/end (set TRIM_DEAD_AIR=1 to enable)
+    trim = None
+    if os.getenv('TRIM_DEAD_AIR', '0') == '1':
+        with span("detect dead air", cat="encode", prefix=prefix):
+            trim = detect_trim_points(desk_file, webcam_file)
+        if trim:
+            record_trim_points(output_dir, prefix, trim)
+    
+    if output_format == "hls":
+        # The playlist only gets #EXT-X-ENDLIST when the encode finishes
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        resume = hls_resume_point(output_file)
+        if resume:
+            print(f"  ↻ Resuming at segment {resume['start_number']} ({resume['offset']:.0f}s)")
+        if merge_with_ffmpeg(desk_file, webcam_file, output_file, trim=trim, mode=encode_mode, preset=preset,
+                             crf=crf, output_format="hls", resume=resume, stats=encode_stats):
+            return "merged"
+        return "failed"
+    
+    # Encode under a temporary name so an interrupted merge never looks finished
+    part_file = os.path.join(output_dir, f"{prefix}_merged.part.mp4")
+    if merge_with_ffmpeg(desk_file, webcam_file, part_file, trim=trim, mode=encode_mode, preset=preset, crf=crf,
+                         output_format=output_format, stats=encode_stats):
+        os.replace(part_file, output_file)
+        return "merged"
+    return "failed"
+
 def merge_videos():
     """Merge downloaded videos"""
     print("Starting SENCE Video Merger (Python)...\n")
@@ -79,32 +394,54 @@ def merge_videos():
         print("No deskshare videos found to merge.")
         return
     
+    # "lecture" drops duplicate frames from static screen-share content
+    encode_mode = os.getenv('ENCODE_MODE', 'standard')
+    # mp4, fmp4 (playable while encoding) or hls (segmented, resumable)
+    output_format = os.getenv('OUTPUT_FORMAT', 'mp4')
+    
     print(f"Found {len(deskshare_files)} video pairs to merge\n")
     
     merged_count = 0
     skipped_count = 0
     
-    for desk_file in deskshare_files:
-        # Get corresponding webcam file
-        prefix = os.path.basename(desk_file).replace('_deskshare.webm', '')
-        webcam_file = os.path.join(input_dir, f"{prefix}_webcams.webm")
-        output_file = os.path.join(output_dir, f"{prefix}_merged.mp4")
-        
-        # Check if webcam file exists
-        if not os.path.exists(webcam_file):
-            print(f"⚠ Skipping {prefix} - webcam file not found")
-            skipped_count += 1
-            continue
+    # Order by SCHEDULE_POLICY (size = both input tracks)
+    prefixes = [os.path.basename(f).replace('_deskshare.webm', '') for f in deskshare_files]
+    prefixes = order_jobs(prefixes, prefix_of=lambda p: p, size_of=lambda p: input_size(input_dir, p))
+    
+    # Pick presets/CRFs that fit ENCODE_DEADLINE / ENCODE_CPU_HOURS (if set)
+    pending = [p for p in prefixes if needs_encode(input_dir, output_dir, p)]
+    encode_plan = build_plan(input_dir, pending) or {}
+    predicted_total = 0
+    actual_total = 0
+    
+    for prefix in prefixes:
+        settings = encode_plan.get(prefix)
+        preset = settings["preset"] if settings else DEFAULT_PRESET
+        crf = settings["crf"] if settings else PRESET_CRF[DEFAULT_PRESET]
         
-        # Check if already merged
-        if os.path.exists(output_file):
-            print(f"⏭ {prefix}_merged.mp4 (exists)")
-            skipped_count += 1
-            continue
+        encode_stats = {}
+        status = merge_recording(prefix, input_dir, output_dir, encode_mode, preset=preset, crf=crf,
+                                 output_format=output_format, encode_stats=encode_stats)
         
-        # Merge
-        if merge_with_ffmpeg(desk_file, webcam_file, output_file):
+        if status == "merged":
             merged_count += 1
+            if settings and encode_stats:
+                elapsed = encode_stats["seconds"]
+                # Feed the real speed back so later plans get more accurate. Only the
+                # encode itself is timed, over the (possibly trimmed or resumed) window.
+                # Lecture mode is skipped: its speed depends on how many frames are dropped
+                if encode_mode != "lecture" and encode_stats["duration"]:
+                    record_actual_speed(preset, encode_stats["duration"], settings["width"], settings["height"],
+                                        elapsed)
+                predicted_total += settings["predicted_seconds"]
+                actual_total += elapsed
+                print(f"  ⏱ {elapsed / 60:.1f} min (predicted {settings['predicted_seconds'] / 60:.1f})")
+        elif status == "skipped":
+            skipped_count += 1
+    
+    if encode_plan and actual_total:
+        print(f"\n⏱ Encoding took {actual_total / 3600:.2f}h (predicted {predicted_total / 3600:.2f}h), "
+              f"finished {datetime.datetime.now():%Y-%m-%d %H:%M}")
     
     print(f"\n✓ Merged {merged_count} videos")
     if skipped_count > 0:
@@ -9,10 +9,22 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 import auth
+from tracing import span, traced_sleep
 
 # Load environment variables
 load_dotenv()
 
+# Append-only log of recordings scraped in the current run
+JOURNAL_FILE = 'playback_journal.jsonl'
+
+# Resources the player does not need for us to see its media requests.
+# Media tracks are blocked too: the request is still logged, no bytes are fetched
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.css',
+    '*.webm', '*.mp4'
+]
+
 def sanitize_filter_name(filter_name):
     """Sanitize filter name for use in filenames and directories"""
     import unicodedata
@@ -21,24 +33,77 @@ def sanitize_filter_name(filter_name):
     sanitized = ''.join(c if c.isalnum() else '_' for c in without_accents).lower()
     return sanitized
 
-def setup_driver():
+def setup_driver(capture='dom'):
     """Set up Chrome WebDriver"""
     options = Options()
     options.add_argument("--headless")  # Run headless for playback scraping
     options.add_argument("--disable-gpu")
     options.add_argument("--no-sandbox")
     
+    if capture == 'network':
+        # Return from get() at DOMContentLoaded and expose DevTools network events
+        options.page_load_strategy = 'eager'
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    
     service = Service(ChromeDriverManager().install())
     driver = webdriver.Chrome(service=service, options=options)
+    
+    if capture == 'network':
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+    
     return driver
 
-def scrape_playback(driver, playback_url):
+def is_media_track(url):
+    """Check whether a requested URL is a BBB webcams/deskshare track"""
+    path = url.split('?')[0]
+    return path.endswith(('.webm', '.mp4')) and ('webcams' in path or 'deskshare' in path)
+
+def capture_media_requests(driver, playback_url, timeout=15, grace=2):
+    """Collect media URLs the player requests, via DevTools performance logs"""
+    driver.get_log('performance')  # Drop events from the previous page
+    with span("page load", cat="browser", url=playback_url):
+        driver.get(playback_url)
+    
+    videos = []
+    deadline = time.time() + timeout
+    webcams_seen_at = None
+    
+    with span("wait for media requests", cat="wait"):
+        while time.time() < deadline:
+            for entry in driver.get_log('performance'):
+                message = json.loads(entry['message'])['message']
+                if message.get('method') != 'Network.requestWillBeSent':
+                    continue
+                url = message['params']['request']['url']
+                if is_media_track(url) and url not in videos:
+                    videos.append(url)
+                    if 'webcams' in url and webcams_seen_at is None:
+                        webcams_seen_at = time.time()
+            
+            # Both tracks seen, or webcams seen and no deskshare within the grace period
+            if any('deskshare' in v for v in videos) and webcams_seen_at:
+                break
+            if webcams_seen_at and time.time() - webcams_seen_at >= grace:
+                break
+            time.sleep(0.2)
+    
+    return videos
+
+def scrape_playback(driver, playback_url, capture='dom'):
     """Scrape video URLs from playback page"""
     print(f"   Scraping playback: {playback_url[:60]}...")
     
     try:
-        driver.get(playback_url)
-        time.sleep(5)  # Wait for page to load
+        if capture == 'network':
+            videos = capture_media_requests(driver, playback_url)
+            if videos:
+                return videos
+            print("   ⚠ No media requests captured, falling back to DOM scan")
+        else:
+            with span("page load", cat="browser", url=playback_url):
+                driver.get(playback_url)
+            traced_sleep(5)  # Wait for page to load
         
         # Find video elements
         videos = []
@@ -88,25 +153,61 @@ def load_recordings(bbb_filter=''):
     with open(latest_file, 'r', encoding='utf-8') as f:
         return json.load(f)
 
+def append_to_journal(journal_file, entry):
+    """Append one scraped recording to the journal and fsync it to disk"""
+    # Start on a fresh line if a previous run died mid-write
+    prefix = ""
+    if os.path.exists(journal_file) and os.path.getsize(journal_file) > 0:
+        with open(journal_file, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                prefix = "\n"
+    
+    with open(journal_file, 'a', encoding='utf-8') as f:
+        f.write(prefix + json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def load_journal(journal_file):
+    """Load recordings journaled by an interrupted run"""
+    entries = []
+    if not os.path.exists(journal_file):
+        return entries
+    
+    with open(journal_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # Torn last line from a crash mid-write
+                continue
+    return entries
+
 def load_existing_playback_data(search_dir):
     """Load existing playback data to avoid re-scraping"""
     try:
         if not os.path.exists(search_dir):
             return {}
         
+        data = []
+        
         # Find all playback files
         playback_files = glob.glob(f"{search_dir}/playback_data_*.json")
-        if not playback_files:
-            return {}
-        
-        # Sort by modification time (newest first)
-        playback_files.sort(key=os.path.getctime, reverse=True)
-        
-        latest_file = playback_files[0]
-        print(f"Loading existing data from: {latest_file}")
+        if playback_files:
+            # Sort by modification time (newest first)
+            playback_files.sort(key=os.path.getctime, reverse=True)
+            
+            latest_file = playback_files[0]
+            print(f"Loading existing data from: {latest_file}")
+            
+            with open(latest_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
         
-        with open(latest_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # Recordings from an interrupted run are newer than any saved file
+        journaled = load_journal(os.path.join(search_dir, JOURNAL_FILE))
+        if journaled:
+            print(f"Resuming from journal: {len(journaled)} recordings")
+            data.extend(journaled)
             
         # Map playback_link -> data
         existing_map = {}
@@ -121,6 +222,25 @@ def load_existing_playback_data(search_dir):
         print(f"⚠ Could not load existing data: {e}")
         return {}
 
+def save_playback_data(output_dir, enriched_data):
+    """Write playback_data_<timestamp>.json and compact the journal into it"""
+    timestamp = time.strftime("%Y-%m-%dT%H-%M-%S")
+    filename = f"{output_dir}/playback_data_{timestamp}.json"
+    
+    # Write then rename so a crash never leaves a partial file
+    with open(f"{filename}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(enriched_data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{filename}.tmp", filename)
+    
+    # Everything journaled is now in the saved file
+    journal_file = os.path.join(output_dir, JOURNAL_FILE)
+    if os.path.exists(journal_file):
+        os.remove(journal_file)
+    
+    return filename
+
 def main():
     """Main function"""
     print("Starting SENCE Playback Scraper (Python)...\n")
@@ -148,9 +268,12 @@ def main():
     new_recordings = [r for r in recordings if r['playback_link'] not in existing_map]
     print(f"\nStatus: {len(existing_map)} existing, {len(new_recordings)} new\n")
     
+    # "network" captures media URLs from DevTools events instead of the DOM
+    capture = os.getenv('PLAYBACK_CAPTURE', 'dom')
+    
     # Setup driver only if needed
     if new_recordings:
-        driver = setup_driver()
+        driver = setup_driver(capture)
         print("Browser started for scraping new recordings...")
     else:
         driver = None
@@ -158,6 +281,8 @@ def main():
     
     try:
         enriched_data = []
+        os.makedirs(output_dir, exist_ok=True)
+        journal_file = os.path.join(output_dir, JOURNAL_FILE)
         
         for i, recording in enumerate(recordings, 1):
             print(f"[{i}/{len(recordings)}] {recording.get('name', 'Unknown')[:60]}...")
@@ -174,29 +299,25 @@ def main():
                 print("   ⚠ No playback link")
                 continue
                 
-            videos = scrape_playback(driver, playback_link)
+            with span("playback", cat="recording", recording=recording.get('name', '')[:60]):
+                videos = scrape_playback(driver, playback_link, capture)
             
             if videos:
                 print(f"   ✓ Found {len(videos)} video(s) (Scraped)")
-                enriched_data.append({
+                entry = {
                     "name": recording['name'],
                     "playback_link": playback_link,
                     "scraped_content": {
                         "videos": videos
                     }
-                })
+                }
+                enriched_data.append(entry)
+                append_to_journal(journal_file, entry)
             else:
                 print("   ⚠ No videos found")
 
         # Save results
-        os.makedirs(output_dir, exist_ok=True)
-        
-        timestamp = time.strftime("%Y-%m-%dT%H-%M-%S")
-        filename = f"{output_dir}/playback_data_{timestamp}.json"
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(enriched_data, f, indent=2, ensure_ascii=False)
-        
+        filename = save_playback_data(output_dir, enriched_data)
         print(f"\n✓ Saved {len(enriched_data)} results to {filename}")
         
     except Exception as e:
@@ -0,0 +1,55 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# fifo:     keep the order of the JSON list / directory scan
+# newest:   most recent recording first (by the YYYYMMDDHHMM file prefix)
+# shortest: smallest total size first, unknown sizes last
+# priority: recordings matching PRIORITY_LIST first, in list order
+POLICIES = ('fifo', 'newest', 'shortest', 'priority')
+
+def get_policies():
+    """Read SCHEDULE_POLICY, e.g. "newest" or "priority,shortest" (first key wins)"""
+    policies = [p.strip() for p in os.getenv('SCHEDULE_POLICY', 'fifo').split(',') if p.strip()]
+    for policy in policies:
+        if policy not in POLICIES:
+            print(f"⚠ Unknown schedule policy '{policy}' (choose from {', '.join(POLICIES)})")
+    return [p for p in policies if p in POLICIES]
+
+def get_priority_list():
+    """Read PRIORITY_LIST: comma-separated prefixes (e.g. 202601051750 or 20260105) or name fragments"""
+    return [p.strip().lower() for p in os.getenv('PRIORITY_LIST', '').split(',') if p.strip()]
+
+def priority_rank(prefix, name, priority_list):
+    """Position of the first PRIORITY_LIST entry matching a recording, or len(list)"""
+    for rank, entry in enumerate(priority_list):
+        if prefix.startswith(entry) or entry in name.lower():
+            return rank
+    return len(priority_list)
+
+def order_jobs(jobs, prefix_of, size_of=None, name_of=None, policies=None):
+    """Sort jobs by the configured policies; jobs tie-break on their original order"""
+    policies = get_policies() if policies is None else policies
+    priority_list = get_priority_list()
+
+    def sort_key(indexed):
+        index, job = indexed
+        key = []
+        for policy in policies:
+            if policy == 'newest':
+                # Prefixes are YYYYMMDDHHMM, so a larger number is a newer recording.
+                # Anything else (e.g. a hand-named file) sorts last
+                prefix = prefix_of(job) or ''
+                key.append((not prefix.isdigit(), -int(prefix) if prefix.isdigit() else 0))
+            elif policy == 'shortest':
+                size = size_of(job) if size_of else None
+                key.append((size is None, size or 0))
+            elif policy == 'priority':
+                name = name_of(job) if name_of else ''
+                key.append(priority_rank(prefix_of(job) or '', name, priority_list))
+        key.append(index)
+        return key
+
+    return [job for _, job in sorted(enumerate(jobs), key=sort_key)]
@@ -1,17 +1,36 @@
 import os
-import time
 import json
 from dotenv import load_dotenv
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 import auth
+from tracing import span, traced_sleep
 
 # Load environment variables
 load_dotenv()
 
+# Reads every row of the recordings table in one WebDriver call
+RECORDINGS_TABLE_SCRIPT = """
+let source = 'bigbluebuttonbn_recordings_table';
+let rows = document.querySelectorAll('#bigbluebuttonbn_recordings_table tbody tr');
+if (!rows.length) {
+    source = 'generaltable';
+    rows = document.querySelectorAll('.generaltable tbody tr');
+}
+return {
+    source: source,
+    rows: Array.from(rows).map(row => ({
+        cells: Array.from(row.querySelectorAll('td')).map(td => td.innerText),
+        links: Array.from(row.querySelectorAll('a')).map(a => ({
+            dataHref: a.getAttribute('data-href'),
+            href: a.href
+        }))
+    }))
+};
+"""
+
 def sanitize_filter_name(filter_name):
     """Sanitize filter name for use in filenames and directories"""
     import unicodedata
@@ -36,49 +55,51 @@ def setup_driver():
 def scrape_recordings(driver, bbb_url):
     """Scrape BigBlueButton recordings from target URL"""
     print(f"\nNavigating to: {bbb_url}")
-    driver.get(bbb_url)
-    time.sleep(5)  # Wait for table to load
+    with span("page load", cat="browser", url=bbb_url):
+        driver.get(bbb_url)
+    traced_sleep(5, "wait for table")  # Wait for table to load
     
     print(f"Scraping: {driver.title}")
     recordings = []
     
     try:
-        # Find recordings table
-        recording_rows = driver.find_elements(By.CSS_SELECTOR, "#bigbluebuttonbn_recordings_table tbody tr")
-        if not recording_rows:
+        # Extract the whole recordings table in a single in-page script call
+        with span("extract table", cat="browser"):
+            table = driver.execute_script(RECORDINGS_TABLE_SCRIPT)
+        if table["source"] != 'bigbluebuttonbn_recordings_table':
             print("   -> 'bigbluebuttonbn_recordings_table' not found. Trying '.generaltable'...")
-            recording_rows = driver.find_elements(By.CSS_SELECTOR, ".generaltable tbody tr")
+        recording_rows = table["rows"]
         
         print(f"   -> Found {len(recording_rows)} recordings")
         
         for row in recording_rows:
             try:
-                cells = row.find_elements(By.TAG_NAME, "td")
+                cells = row["cells"]
                 if len(cells) < 5:
                     continue
                 
                 # Get the recording name from column 1 (c1)
-                name_text = cells[1].text.strip() if cells[1] else 'Recording'
+                name_text = cells[1].strip() if cells[1] else 'Recording'
                 
                 # Get the date from column 4 (c4)
-                date_text = cells[4].text.strip() if cells[4] else ''
+                date_text = cells[4].strip() if cells[4] else ''
                 
                 # Combine: "Date - Name"
                 full_name = f"{date_text} - {name_text}" if date_text else name_text
                 
                 # Extract playback link from data-href attribute
-                links = row.find_elements(By.TAG_NAME, "a")
+                links = row["links"]
                 playback_link = None
                 
                 for link in links:
                     # Check data-href attribute first
-                    data_href = link.get_attribute("data-href")
+                    data_href = link["dataHref"]
                     if data_href and ('aulavirtual.sence.cl' in data_href or 'playback' in data_href):
                         playback_link = data_href
                         break
                     
                     # Fallback to href
-                    href = link.get_attribute("href")
+                    href = link["href"]
                     if href and ('aulavirtual.sence.cl' in href or 'playback' in href):
                         playback_link = href
                         break
@@ -111,11 +132,14 @@ def main():
     
     try:
         # Navigate to BBB URL
-        driver.get(bbb_url)
-        time.sleep(2)
+        with span("page load", cat="browser", url=bbb_url):
+            driver.get(bbb_url)
+        traced_sleep(2)
         
         # Attempt auto-login
-        if not auth.auto_login(driver):
+        with span("login", cat="browser"):
+            logged_in = auth.auto_login(driver)
+        if not logged_in:
             print("\n" + "="*60)
             print("Auto-login failed or no credentials provided.")
             print("Please log in manually in the browser window.")
@@ -124,7 +148,8 @@ def main():
             input()
         
         # Scrape recordings
-        recordings = scrape_recordings(driver, bbb_url)
+        with span("scrape recordings", cat="browser"):
+            recordings = scrape_recordings(driver, bbb_url)
         
         # Prepare output directory
         if bbb_filter:
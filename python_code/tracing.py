@@ -0,0 +1,82 @@
+import os
+import sys
+import json
+import glob
+import time
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Spans are only recorded when TRACE_DIR is set
+TRACE_DIR = os.getenv('TRACE_DIR', '')
+
+_lock = threading.Lock()
+_trace_file = None
+
+def _write_event(event):
+    """Append one trace event to this process's file (JSON array format)"""
+    global _trace_file
+    with _lock:
+        if _trace_file is None:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            script = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+            _trace_file = open(os.path.join(TRACE_DIR, f"trace-{script}-{os.getpid()}.json"), 'w', encoding='utf-8')
+            # The closing "]" is optional in this format, so a crashed run stays readable
+            _trace_file.write("[\n")
+            _trace_file.write(json.dumps({
+                "name": "process_name", "ph": "M", "pid": os.getpid(),
+                "args": {"name": script}
+            }) + ",\n")
+        _trace_file.write(json.dumps(event, ensure_ascii=False) + ",\n")
+        _trace_file.flush()
+
+@contextmanager
+def span(name, cat="pipeline", **args):
+    """Record a complete ("X") event around a block, if tracing is enabled"""
+    if not TRACE_DIR:
+        yield
+        return
+
+    start = time.time()
+    try:
+        yield
+    finally:
+        # Wall-clock microseconds so spans from separate processes line up
+        _write_event({
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": int(start * 1_000_000),
+            "dur": int((time.time() - start) * 1_000_000),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args
+        })
+
+def traced_sleep(seconds, reason="wait"):
+    """time.sleep that shows up as a wait span"""
+    with span(reason, cat="wait", seconds=seconds):
+        time.sleep(seconds)
+
+def load_trace_file(trace_file):
+    """Read a per-process trace file, tolerating a missing "]" or trailing comma"""
+    with open(trace_file, 'r', encoding='utf-8') as f:
+        text = f.read().strip()
+    return json.loads(text.rstrip(",]") + "]")
+
+def merge_traces(trace_dir, output_file):
+    """Combine every per-process trace in trace_dir into one Chrome trace file"""
+    events = []
+    for trace_file in sorted(glob.glob(os.path.join(trace_dir, "trace-*.json"))):
+        try:
+            events.extend(load_trace_file(trace_file))
+        except (OSError, ValueError) as e:
+            print(f"⚠ Skipping unreadable trace {trace_file}: {e}")
+
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return len(events)
@@ -0,0 +1,164 @@
+import os
+import time
+from dotenv import load_dotenv
+import auth
+from tracing import span
+from session_scraper import scrape_recordings
+from playback_scraper import (
+    sanitize_filter_name, setup_driver, scrape_playback,
+    load_existing_playback_data, append_to_journal, save_playback_data, JOURNAL_FILE
+)
+from download_videos import plan_downloads, order_plan, fetch_track
+from merge_videos import merge_recording
+
+# Load environment variables
+load_dotenv()
+
+def ensure_logged_in(driver):
+    """Log in again if the warm session has expired"""
+    if auth.is_logged_in(driver.current_url):
+        return
+    print("Session expired - logging in again")
+    if not auth.auto_login(driver):
+        raise RuntimeError("auto-login failed (set RUN and PASSWORD in .env for watch mode)")
+
+def process_recording(entry, download_dir, merged_dir, encode_mode, output_format="mp4"):
+    """Download and merge one newly scraped recording"""
+    plan, _ = plan_downloads([entry], download_dir, merged_dir, probe=False)
+    for plan_entry in order_plan(plan):
+        for track in plan_entry["tracks"]:
+            if os.path.exists(track["output_path"]):
+                continue
+            print(f"⬇ {track['filename']}...")
+            if not fetch_track(track["url"], track["output_path"]):
+                return False
+
+        if any(t["suffix"] == "deskshare" for t in plan_entry["tracks"]):
+            status = merge_recording(plan_entry["prefix"], download_dir, merged_dir, encode_mode,
+                                     output_format=output_format)
+            if status == "failed":
+                return False
+    return True
+
+def record_failure(failures, link, max_attempts, reason):
+    """Count a failed attempt for a recording and say whether it will be retried"""
+    failures[link] = failures.get(link, 0) + 1
+    if failures[link] >= max_attempts:
+        print(f"   ✗ {reason} ({failures[link]} attempts, giving up until restart)")
+    else:
+        print(f"   ⚠ {reason} (attempt {failures[link]}/{max_attempts}, will retry next poll)")
+
+def poll_once(driver, bbb_url, capture, known, pending, failures, dirs, encode_mode):
+    """Scrape the recordings list once and push new recordings through the pipeline
+
+    `known` holds finished recordings, `pending` scraped ones whose download or
+    merge has not succeeded yet, and `failures` counts failed attempts per link.
+    """
+    scraped_dir, download_dir, merged_dir = dirs
+    max_attempts = int(os.getenv('WATCH_MAX_ATTEMPTS', '3'))
+
+    with span("poll", cat="watch"):
+        recordings = scrape_recordings(driver, bbb_url)
+        if not auth.is_logged_in(driver.current_url):
+            ensure_logged_in(driver)
+            recordings = scrape_recordings(driver, bbb_url)
+    if not recordings:
+        # scrape_recordings returns [] when the table is missing or the page is broken;
+        # raising lets main() back off instead of polling a broken page at full rate
+        raise RuntimeError("recordings table missing or empty")
+
+    new_recordings = [r for r in recordings
+                      if r['playback_link'] not in known and failures.get(r['playback_link'], 0) < max_attempts]
+    if not new_recordings:
+        return 0
+
+    print(f"\n🆕 {len(new_recordings)} new recording(s)")
+    ready = 0
+    for recording in new_recordings:
+        link = recording['playback_link']
+        print(f"▶ {recording['name'][:60]}...")
+
+        # Recordings whose download or merge failed are retried without scraping them again
+        entry = pending.get(link)
+        if entry is None:
+            with span("playback", cat="recording", recording=recording['name'][:60]):
+                videos = scrape_playback(driver, link, capture)
+            if not videos:
+                record_failure(failures, link, max_attempts, "No videos found")
+                continue
+            entry = {
+                "name": recording['name'],
+                "playback_link": link,
+                "scraped_content": {
+                    "videos": videos
+                }
+            }
+            pending[link] = entry
+
+        if not process_recording(entry, download_dir, merged_dir, encode_mode, os.getenv('OUTPUT_FORMAT', 'mp4')):
+            record_failure(failures, link, max_attempts, "Download or merge failed")
+            continue
+
+        # Only finished recordings are journaled, so a restart picks up unfinished ones again
+        append_to_journal(os.path.join(scraped_dir, JOURNAL_FILE), entry)
+        known[link] = pending.pop(link)
+        ready += 1
+        print(f"   ✓ Ready")
+
+    # Fold the journal into a fresh playback_data file for the other scripts
+    if ready:
+        save_playback_data(scraped_dir, list(known.values()))
+    return len(new_recordings)
+
+def main():
+    """Main function"""
+    print("Starting SENCE Watch Mode (Python)...")
+
+    bbb_url = os.getenv('BBB_URL', 'https://auladigital.sence.cl/mod/bigbluebuttonbn/view.php?id=748489')
+    bbb_filter = os.getenv('BBB_FILTER', '')
+    capture = os.getenv('PLAYBACK_CAPTURE', 'dom')
+    encode_mode = os.getenv('ENCODE_MODE', 'standard')
+    interval = float(os.getenv('WATCH_INTERVAL', '300'))
+    max_interval = float(os.getenv('WATCH_MAX_INTERVAL', '3600'))
+
+    if bbb_filter:
+        safe_name = sanitize_filter_name(bbb_filter)
+        dirs = (f"scraped_data/{safe_name}", f"downloaded_videos/{safe_name}", f"merged_videos/{safe_name}")
+    else:
+        dirs = ("scraped_data", "downloaded_videos", "merged_videos")
+    for directory in dirs:
+        os.makedirs(directory, exist_ok=True)
+
+    known = load_existing_playback_data(dirs[0])
+    pending = {}
+    failures = {}
+    print(f"Watching {bbb_url} every {interval:.0f}s (backing off up to {max_interval:.0f}s on errors)\n")
+
+    # One browser for the whole run keeps the session warm between polls
+    driver = setup_driver(capture)
+    try:
+        driver.get(bbb_url)
+        with span("login", cat="browser"):
+            ensure_logged_in(driver)
+
+        delay = interval
+        while True:
+            try:
+                poll_once(driver, bbb_url, capture, known, pending, failures, dirs, encode_mode)
+                delay = interval
+            except Exception as e:
+                # Site down or session trouble: back off instead of hammering it
+                print(f"✗ Poll failed: {e}")
+                delay = min(delay * 2, max_interval)
+
+            print(f"\n💤 Next poll in {delay:.0f}s ({time.strftime('%H:%M', time.localtime(time.time() + delay))})")
+            time.sleep(delay)
+
+    except KeyboardInterrupt:
+        print("\n⛔ Watch mode stopped by user.")
+    finally:
+        print("\nClosing browser...")
+        driver.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import os
+import sys
+import glob
+import json
+import time
+import signal
+import socket
+import multiprocessing
+from dotenv import load_dotenv
+from job_queue import JobQueue
+from tracing import span
+from download_videos import sanitize_filter_name, plan_downloads, plan_entry_size, fetch_track
+from scheduling import order_jobs
+from merge_videos import merge_recording
+import media_store
+
+# Load environment variables
+load_dotenv()
+
+def get_directories(bbb_filter):
+    """Return (scraped, downloaded, merged) directories for a filter"""
+    if bbb_filter:
+        safe_name = sanitize_filter_name(bbb_filter)
+        return f"scraped_data/{safe_name}", f"downloaded_videos/{safe_name}", f"merged_videos/{safe_name}"
+    return "scraped_data", "downloaded_videos", "merged_videos"
+
+def job_keys(entry, download_dir, merged_dir):
+    """Queue keys for a recording's download and merge jobs
+
+    With MEDIA_STORE, jobs are keyed by BBB recording id, so a recording reached
+    through several filters is one job whose payload lists every filter's directories.
+    """
+    recording_id = media_store.recording_id_from_url(entry["tracks"][0]["url"]) if media_store.MEDIA_STORE else None
+    if recording_id:
+        store_dir = media_store.recording_dir(recording_id)
+        return store_dir, store_dir
+    return f"{download_dir}/{entry['prefix']}", f"{merged_dir}/{entry['prefix']}"
+
+def enqueue_jobs(queue):
+    """Queue a download job and a dependent merge job per recording"""
+    bbb_filter = os.getenv('BBB_FILTER', '')
+    scraped_dir, download_dir, merged_dir = get_directories(bbb_filter)
+
+    files = glob.glob(f"{scraped_dir}/playback_data_*.json")
+    if not files:
+        print(f"No playback data files found in: {scraped_dir}")
+        return
+
+    latest_file = max(files, key=os.path.getctime)
+    print(f"Processing: {latest_file}")
+
+    with open(latest_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    probe = os.getenv('PROBE_MEDIA', '1') != '0'
+    plan, _ = plan_downloads(data, download_dir, merged_dir, probe=probe)
+
+    encode_mode = os.getenv('ENCODE_MODE', 'standard')
+    queued = 0
+    for entry in plan:
+        prefix = entry["prefix"]
+        size = plan_entry_size(entry)
+        download_key, merge_key = job_keys(entry, download_dir, merged_dir)
+        # Name and size are kept so rank_queued_jobs can order jobs from any enqueue run
+        download_id = queue.enqueue("download", download_key, {
+            "prefix": prefix,
+            "name": entry["name"],
+            "size": size,
+            "tracks": [{"url": t["url"], "filename": t["filename"]} for t in entry["tracks"]],
+            "views": [download_dir]
+        })
+        # The job may already exist for another filter; make sure this one is linked too
+        queue.add_to_payload(download_id, "views", download_dir)
+
+        # Only recordings with a deskshare track are merged (same as merge_videos)
+        if any(t["suffix"] == "deskshare" for t in entry["tracks"]):
+            view = {"input_dir": download_dir, "output_dir": merged_dir}
+            merge_id = queue.enqueue("merge", merge_key, {
+                "prefix": prefix,
+                "name": entry["name"],
+                "size": size,
+                "views": [view],
+                "encode_mode": encode_mode,
+                "output_format": os.getenv('OUTPUT_FORMAT', 'mp4')
+            }, depends_on=download_id)
+            queue.add_to_payload(merge_id, "views", view)
+        queued += 1
+
+    rank_queued_jobs(queue)
+    print(f"\n✓ Queued {queued} recordings in {queue.path}")
+
+def rank_queued_jobs(queue):
+    """Re-rank every queued job by SCHEDULE_POLICY, including jobs from earlier enqueue runs
+
+    Priorities are only comparable within one ranking, so all queued rows (both
+    kinds) are ranked together. A recording's download and merge share its policy
+    key, and ties keep enqueue order, which is also what fifo means here.
+    """
+    jobs = order_jobs(queue.queued_jobs(), prefix_of=lambda j: j["payload"]["prefix"],
+                      size_of=lambda j: j["payload"].get("size"),
+                      name_of=lambda j: j["payload"].get("name", ""))
+    # Workers claim higher priorities first, so earlier jobs go first
+    queue.set_priorities({job["id"]: len(jobs) - position for position, job in enumerate(jobs)})
+
+def run_download(payload):
+    """Download every track of one recording into each directory that wants it"""
+    for download_dir in payload["views"]:
+        os.makedirs(download_dir, exist_ok=True)
+        for track in payload["tracks"]:
+            output_path = os.path.join(download_dir, track["filename"])
+            if os.path.exists(output_path):
+                print(f"⏭ {track['filename']} (already exists)")
+                continue
+            print(f"⬇ {track['filename']}...")
+            if not fetch_track(track["url"], output_path):
+                raise RuntimeError(f"download failed: {track['url']}")
+
+def run_merge(payload):
+    """Merge one recording into each output directory that wants it"""
+    for view in payload["views"]:
+        os.makedirs(view["output_dir"], exist_ok=True)
+        status = merge_recording(payload["prefix"], view["input_dir"], view["output_dir"], payload["encode_mode"],
+                                 output_format=payload.get("output_format", "mp4"))
+        if status == "failed":
+            raise RuntimeError(f"merge failed: {payload['prefix']}")
+
+JOB_HANDLERS = {
+    "download": run_download,
+    "merge": run_merge
+}
+
+def run_handler(kind, payload, errors):
+    """Child process entry point: run one job handler and send back its error, if any"""
+    if hasattr(os, "setsid"):
+        # Own process group, so aborting the job also stops the wget/ffmpeg it started
+        os.setsid()
+    try:
+        JOB_HANDLERS[kind](payload)
+    except Exception as e:
+        errors.send(str(e))
+        sys.exit(1)
+
+def abort_handler(process):
+    """Stop a job's child process and everything it started"""
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    else:
+        process.terminate()
+    process.join()
+
+def run_job(queue, job, worker_id):
+    """Run a claimed job in a child process, heartbeating its lease until it exits
+
+    If the lease is lost (e.g. this worker stalled and another one took the job),
+    the child is killed so two workers never write the same files.
+    """
+    errors, child_errors = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=run_handler, args=(job["kind"], job["payload"], child_errors))
+    with span(job["kind"], cat="job", prefix=job["payload"]["prefix"], worker=worker_id):
+        process.start()
+        try:
+            while True:
+                process.join(queue.lease_seconds / 3)
+                if process.exitcode is not None:
+                    break
+                if not queue.heartbeat(job["id"], worker_id):
+                    print(f"⚠ Lost lease on job {job['id']}, aborting it")
+                    abort_handler(process)
+                    raise RuntimeError("lost lease")
+        finally:
+            # Also covers Ctrl+C, which the child does not see in its own process group
+            if process.is_alive():
+                abort_handler(process)
+
+    if process.exitcode != 0:
+        raise RuntimeError(errors.recv() if errors.poll() else f"{job['kind']} exited with code {process.exitcode}")
+
+def work(queue, kinds=None):
+    """Claim and run jobs until nothing is left to do"""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    poll_seconds = float(os.getenv('WORKER_POLL_SECONDS', '10'))
+    print(f"Worker {worker_id} started (queue: {queue.path})\n")
+
+    done = 0
+    while True:
+        job = queue.claim(worker_id, kinds)
+        if job is None:
+            # Other workers may still hold leases or be unblocking dependencies
+            if not queue.has_pending(kinds):
+                break
+            time.sleep(poll_seconds)
+            continue
+
+        print(f"▶ [{job['kind']}] {job['payload']['prefix']} (attempt {job['attempts'] + 1})")
+        try:
+            run_job(queue, job, worker_id)
+            queue.complete(job["id"], worker_id, job["payload"])
+            done += 1
+        except Exception as e:
+            print(f"  ✗ {e}")
+            queue.fail(job["id"], worker_id, e)
+
+    print(f"\n✓ Worker finished: {done} jobs completed")
+
+def print_status(queue):
+    """Print job counts per status"""
+    counts = queue.counts()
+    print(f"Queue: {queue.path}")
+    for status in ("queued", "leased", "done", "failed"):
+        print(f"   {status:<7} {counts.get(status, 0)}")
+    if counts.get("failed"):
+        print("Run 'python worker.py enqueue' again to retry failed jobs")
+
+def main():
+    """Main function"""
+    command = sys.argv[1] if len(sys.argv) > 1 else "work"
+    kinds = None
+    for arg in sys.argv[2:]:
+        if arg.startswith("--kinds="):
+            kinds = [k for k in arg.split("=", 1)[1].split(",") if k]
+
+    queue = JobQueue()
+
+    if command == "enqueue":
+        enqueue_jobs(queue)
+    elif command == "work":
+        work(queue, kinds)
+    elif command == "status":
+        print_status(queue)
+    else:
+        print("Usage: python worker.py [enqueue|work|status] [--kinds=download,merge]")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
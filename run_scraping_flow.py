@@ -2,6 +2,10 @@ import subprocess
 import time
 import sys
 import os
+import glob
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'python_code'))
+from tracing import TRACE_DIR, span, merge_traces
 
 # Define the steps in order
 STEPS = [
@@ -11,6 +15,8 @@ STEPS = [
     {'script': 'python_code/merge_videos.py',    'desc': 'Merging into MP4'}
 ]
 
+WATCH_STEP = {'script': 'python_code/watch.py', 'desc': 'Watching for New Recordings'}
+
 def run_step(step):
     """Run a single step"""
     print(f"\n🔹 [Step] {step['desc']}...")
@@ -29,7 +35,8 @@ def run_step(step):
                 print(f"❌ Script not found: {step['script']}")
                 return False
         
-        result = subprocess.run(cmd, check=False)
+        with span(step['desc'], cat="stage"):
+            result = subprocess.run(cmd, check=False)
         
         if result.returncode == 0:
             print(f"✅ [Step] {step['desc']} Completed")
@@ -43,12 +50,24 @@ def run_step(step):
         return False
 
 def main():
-    print("🚀 Starting Full Scraping Pipeline (Python)")
-    print("=========================================")
+    # Long-running mode: poll for new recordings and process them incrementally
+    watch = "--watch" in sys.argv
+    
+    if not watch:
+        print("🚀 Starting Full Scraping Pipeline (Python)")
+        print("=========================================")
     
     start_time = time.time()
     
+    # Start each traced run from an empty set of per-process traces
+    if TRACE_DIR:
+        for old_trace in glob.glob(os.path.join(TRACE_DIR, "trace-*.json")):
+            os.remove(old_trace)
+    
     try:
+        if watch:
+            sys.exit(0 if run_step(WATCH_STEP) else 1)
+        
         for step in STEPS:
             if not run_step(step):
                 print("\n⛔ Pipeline Stopped due to error.")
@@ -62,6 +81,13 @@ def main():
     except KeyboardInterrupt:
         print("\n\n⛔ Pipeline stopped by user.")
         sys.exit(1)
+    finally:
+        # Combine per-process traces into one file for chrome://tracing / Perfetto.
+        # Failed and interrupted runs are the ones most worth looking at
+        if TRACE_DIR:
+            trace_file = os.path.join(TRACE_DIR, "pipeline_trace.json")
+            count = merge_traces(TRACE_DIR, trace_file)
+            print(f"📈 Trace: {trace_file} ({count} events)")
 
 if __name__ == "__main__":
     main()